@@ -1,27 +1,56 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
+import atexit
+import signal
+import sys
 import re
 import json
 import time
+import heapq
+import queue
+import itertools
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from telebot import TeleBot, types
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import TeleBot, types, apihelper
+from telebot.apihelper import ApiTelegramException
 from dotenv import load_dotenv
 import datetime
-import pytz   # 🟢 mana shu joyda qo‘sh
+import functools
+from collections import OrderedDict, deque
+from types import MappingProxyType
+from zoneinfo import ZoneInfo
+
+# orjson is much faster than stdlib json; fall back to json if not installed
+try:
+    import orjson
+    def _dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(data):
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    _loads = json.loads
 
 # Timezone: always use Tashkent time
-TASHKENT_TZ = pytz.timezone("Asia/Tashkent")
+TASHKENT_TZ = ZoneInfo("Asia/Tashkent")
 
 def now_tashkent():
     """Return timezone-aware current datetime in Tashkent."""
     return datetime.datetime.now(TASHKENT_TZ)
 
+@functools.lru_cache(maxsize=1)
+def _tashkent_date_for_minute(epoch_minute):
+    return datetime.datetime.fromtimestamp(epoch_minute * 60, TASHKENT_TZ).date()
+
 def today_tashkent_date():
-    """Return current date in Tashkent (datetime.date)."""
-    return now_tashkent().date()
+    """Return current date in Tashkent (datetime.date); shared by all calls in the same minute."""
+    return _tashkent_date_for_minute(int(time.time() // 60))
 
 # ========================
 # .env -> TOKEN, ADMIN_ID
@@ -33,7 +62,15 @@ if not TOKEN or ADMIN_ID == 0:
     print("❌ .env faylida TOKEN va ADMIN_ID to'g'ri kiritilganiga ishonch hosil qiling.")
     exit(1)
 
-bot = TeleBot(TOKEN, threaded=True)
+# One shared keep-alive session for every API call (instead of one per thread),
+# with enough pooled connections for the broadcast pool plus update workers.
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=3))
+apihelper.session = _http
+
+# Handlers run synchronously on the per-chat update workers (see poll_updates)
+bot = TeleBot(TOKEN, threaded=False)
+BOT_ID = None  # our own user id; resolved once via get_me() at startup
 
 # Register bot commands so that when someone types "/" in a Telegram chat
 # the commands like /bugun and /ertaga appear in the command suggestion list.
@@ -77,21 +114,43 @@ BACKUP_DIR.mkdir(exist_ok=True)
 def load_json(path, default):
     try:
         if path.exists():
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return _loads(f.read())
     except Exception as e:
         print("JSON load error:", e)
     return default
 
+# Guards every mutation of users/groups/settings/schedules; save_json encodes
+# its snapshot under it, then does the disk write outside the lock.
+_store_lock = threading.RLock()
+
+class OrderedIdSet(dict):
+    """Set of chat ids that remembers insertion order (dict keys); saved as a JSON list."""
+    def add(self, chat_id):
+        self[chat_id] = None
+
 def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    """Write JSON atomically: dump to a temp file, then os.replace over path."""
+    with _store_lock:
+        if isinstance(data, (set, frozenset)):
+            data = sorted(data)
+        elif isinstance(data, OrderedIdSet):
+            data = list(data)
+        payload = _dumps(data)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
 
 # ========================
 # Load or init data stores
 # ========================
-users = load_json(USERS_FILE, [])
-groups = load_json(GROUPS_FILE, [])  # list of group chat ids (ints)
+# users/groups have O(1) membership in memory. users keeps registration order
+# (saved oldest first); groups is a plain set saved as a sorted list.
+users = OrderedIdSet.fromkeys(load_json(USERS_FILE, []))
+# last registered users for statistics, newest last
+_recent_users = deque(list(users)[-10:], maxlen=10)
+groups = set(load_json(GROUPS_FILE, []))  # set of group chat ids (ints)
 schedules = load_json(SCHEDULES_FILE, {
     "tepa": {
         "Monday": "08:00 - Matematika\n09:00 - Fizika\n10:30 - Ingliz tili",
@@ -118,16 +177,25 @@ settings = load_json(SETTINGS_FILE, {
     "send_6am": True,
     "send_18pm": True
 })
+# settings["current_week"] mirrored in a module variable; change it only via switch_current_week()
+CURRENT_WEEK = settings.get("current_week", "tepa")
+# bot-global admins as a frozenset for O(1) checks; rebuilt whenever settings["admins"] changes
+_admins_set = frozenset(settings.get("admins", []))
 
 # persist initial files if missing
-save_json(USERS_FILE, users)
-save_json(GROUPS_FILE, groups)
-save_json(SCHEDULES_FILE, schedules)
-save_json(SETTINGS_FILE, settings)
+for _path, _data in ((USERS_FILE, users), (GROUPS_FILE, groups),
+                     (SCHEDULES_FILE, schedules), (SETTINGS_FILE, settings)):
+    if not _path.exists():
+        save_json(_path, _data)
 
 # ========================
 # Utilities: day mapping, pretty text
 # ========================
+_EMPTY = MappingProxyType({})  # shared read-only default for .get() on nested stores
+
+_TIME_RE = re.compile(r"\s*(\d{1,2}:\d{2})\s*-\s*(.+)")        # "HH:MM - Subject"
+_LESSON_RE = re.compile(r"(\d{1,2}:\d{2})\s*[-–—]?\s*(.*)")     # time + subject anywhere in line
+
 EN_TO_UZ_BTN = {
     "Monday": "📘 Dushanba",
     "Tuesday": "📗 Seshanba",
@@ -138,26 +206,95 @@ EN_TO_UZ_BTN = {
     "Sunday": "🌞 Yakshanba"
 }
 UZ_BTN_TO_EN = {v: k for k, v in EN_TO_UZ_BTN.items()}
+BTN_INFO = {uz: (en, uz) for uz, en in UZ_BTN_TO_EN.items()}  # day button -> (en_day, label)
+# date.weekday() -> English day name (cheaper than strftime("%A"))
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DAYS = _WEEKDAYS[:6]  # school days (Monday..Saturday)
+# "🗓 *Dushanba*\n"-style day headings used by the weekly views
+_DAY_HEADINGS = {d: f"🗓 *{EN_TO_UZ_BTN[d]}*\n" for d in DAYS}
+
+ADMIN_CACHE_TTL = 60     # seconds
+ADMIN_CACHE_MAX = 1024   # entries; oldest inserted is evicted first
+_admin_cache = {}  # (chat_id, user_id) -> (checked_at, is_admin)
+_admin_cache_lock = threading.Lock()
 
 def is_user_admin_in_chat(chat_id, user_id):
-    """Return True if user is chat admin (works for groups)"""
+    """Return True if user is chat admin (works for groups); cached for ADMIN_CACHE_TTL"""
+    key = (chat_id, user_id)
+    entry = _admin_cache.get(key)
+    if entry and time.monotonic() - entry[0] < ADMIN_CACHE_TTL:
+        return entry[1]
     try:
         admins = bot.get_chat_administrators(chat_id)
-        return any(a.user.id == user_id for a in admins)
+        result = any(a.user.id == user_id for a in admins)
     except Exception:
         return False
+    with _admin_cache_lock:
+        _admin_cache.pop(key, None)
+        if len(_admin_cache) >= ADMIN_CACHE_MAX:
+            del _admin_cache[next(iter(_admin_cache))]
+        _admin_cache[key] = (time.monotonic(), result)
+    return result
+
+def forget_chat_admins(chat_id):
+    """Drop cached admin checks for a chat (membership there changed)."""
+    with _admin_cache_lock:
+        for key in [k for k in _admin_cache if k[0] == chat_id]:
+            del _admin_cache[key]
+
+def _parse_schedule(jadval_text):
+    """Return {time: subject} for the lesson lines of a schedule text (first line wins)"""
+    lessons = {}
+    for line in jadval_text.splitlines():
+        m = _LESSON_RE.search(line)
+        if m:
+            lessons.setdefault(m.group(1), m.group(2).strip())
+    return lessons
+
+def _build_schedule_index():
+    with _store_lock:
+        return {week: {day: _parse_schedule(text) for day, text in days.items()}
+                for week, days in schedules.items()}
+
+# week -> day -> {time: subject}; parsed once instead of on every reminder
+_schedule_index = _build_schedule_index()
+
+# (day_en, week_type) -> rendered text; cleared whenever schedules change
+_pretty_cache = {}
+_weekly_cache = {}  # week_type -> rendered weekly text
+
+def invalidate_schedule_caches():
+    """Call after every mutation of `schedules`, inside the same `with _store_lock:` block."""
+    global _schedule_index
+    with _store_lock:
+        _pretty_cache.clear()
+        _weekly_cache.clear()
+        _schedule_index = _build_schedule_index()
 
 def pretty_schedule_text(day_en, week_type):
-    """Make markdown formatted schedule text"""
+    """Make markdown formatted schedule text (cached until schedules change)"""
+    key = (day_en, week_type)
+    text = _pretty_cache.get(key)
+    if text is None:
+        # render and store under the store lock, so an edit can't clear the
+        # cache between our read of `schedules` and the store
+        with _store_lock:
+            text = _render_schedule_text(day_en, week_type)
+            # callback data is client-supplied: only cache known days/weeks
+            if day_en in EN_TO_UZ_BTN and week_type in schedules:
+                _pretty_cache[key] = text
+    return text
+
+def _render_schedule_text(day_en, week_type):
     if day_en == "Sunday":
         return "🌞 *Yakshanba* — Bugun dars yo'q!!!"
-    jadval = schedules.get(week_type, {}).get(day_en)
+    jadval = schedules.get(week_type, _EMPTY).get(day_en)
     if not jadval:
         return f"❌ *{EN_TO_UZ_BTN.get(day_en, day_en)}* uchun jadval topilmadi."
     header = f"📅 *{EN_TO_UZ_BTN.get(day_en, day_en)}* — *{'Tepa' if week_type=='tepa' else 'Pastgi'} hafta*\n\n"
     lines = []
     for line in jadval.splitlines():
-        m = re.match(r"\s*(\d{1,2}:\d{2})\s*-\s*(.+)", line)
+        m = _TIME_RE.match(line)
         if m:
             t, subject = m.groups()
             lines.append(f"⏰ `{t}` — *{subject}*")
@@ -165,9 +302,21 @@ def pretty_schedule_text(day_en, week_type):
             lines.append(f"• {line}")
     return header + "\n".join(lines)
 
-def parse_times_from_text(jadval_text):
-    times = re.findall(r"(\d{1,2}:\d{2})", jadval_text)
-    return sorted(list(dict.fromkeys(times)))
+def weekly_schedule_text(week):
+    """Markdown text of the whole week (cached until schedules change)"""
+    text = _weekly_cache.get(week)
+    if text is None:
+        with _store_lock:  # see pretty_schedule_text
+            text = _build_weekly(week)
+            if week in schedules:
+                _weekly_cache[week] = text
+    return text
+
+def _build_weekly(week):
+    header = f"📅 *{week.capitalize()} hafta* — Haftalik jadval:\n\n"
+    week_days = schedules.get(week, _EMPTY)
+    body_parts = [f"{_DAY_HEADINGS[d]}{week_days.get(d, '—')}\n" for d in DAYS]
+    return header + "\n".join(body_parts)
 
 # ========================
 # Save helper wrappers
@@ -178,44 +327,122 @@ def save_all():
     save_json(SCHEDULES_FILE, schedules)
     save_json(SETTINGS_FILE, settings)
 
+# Mutations only mark a store dirty; a background thread wakes on the first
+# mark, waits FLUSH_DEBOUNCE seconds for more, then writes each dirty store once.
+FLUSH_DEBOUNCE = 0.5  # seconds
+STORES = {
+    "users": (USERS_FILE, users),
+    "groups": (GROUPS_FILE, groups),
+    "schedules": (SCHEDULES_FILE, schedules),
+    "settings": (SETTINGS_FILE, settings),
+}
+_dirty = set()
+_dirty_event = threading.Event()
+
+def mark_dirty(name):
+    _dirty.add(name)
+    _dirty_event.set()
+
+def switch_current_week():
+    """Flip tepa <-> pastgi in both CURRENT_WEEK and settings; return the new week."""
+    global CURRENT_WEEK
+    with _store_lock:
+        CURRENT_WEEK = "pastgi" if CURRENT_WEEK == "tepa" else "tepa"
+        settings["current_week"] = CURRENT_WEEK
+    mark_dirty("settings")
+    return CURRENT_WEEK
+
+def flush_dirty():
+    for name in list(_dirty):
+        # discard first: a mutation during the write re-marks the store
+        _dirty.discard(name)
+        path, data = STORES[name]
+        try:
+            save_json(path, data)
+        except Exception as e:
+            mark_dirty(name)
+            print("JSON save error:", e)
+
+def _flusher():
+    while True:
+        _dirty_event.wait()
+        time.sleep(FLUSH_DEBOUNCE)
+        _dirty_event.clear()
+        flush_dirty()
+
+threading.Thread(target=_flusher, daemon=True).start()
+atexit.register(flush_dirty)
+
 # ========================
 # Scheduling & reminders
 # ========================
+# Token bucket: Telegram allows ~30 messages/sec globally. Each send takes a
+# token; a refill thread puts up to SEND_RATE tokens back every second.
+SEND_RATE = 30
+SEND_MAX_RETRIES = 3  # retries after a 429 (Too Many Requests)
+_send_tokens = threading.BoundedSemaphore(SEND_RATE)
+
+def _refill_send_tokens():
+    while True:
+        time.sleep(1)
+        for _ in range(SEND_RATE):
+            try:
+                _send_tokens.release()
+            except ValueError:  # bucket is full
+                break
+
+threading.Thread(target=_refill_send_tokens, daemon=True).start()
+
 def send_message_safe(chat_id, text, parse_mode="Markdown", reply_markup=None):
-    try:
-        bot.send_message(chat_id, text, parse_mode=parse_mode, reply_markup=reply_markup)
-    except Exception as e:
-        print(f"Send error to {chat_id}: {e}")
+    for attempt in range(SEND_MAX_RETRIES + 1):
+        _send_tokens.acquire()
+        try:
+            bot.send_message(chat_id, text, parse_mode=parse_mode, reply_markup=reply_markup)
+            return True
+        except ApiTelegramException as e:
+            if e.error_code == 429 and attempt < SEND_MAX_RETRIES:
+                retry_after = (e.result_json or {}).get("parameters", {}).get("retry_after", 1)
+                time.sleep(retry_after)
+                continue
+            print(f"Send error to {chat_id}: {e}")
+            return False
+        except Exception as e:
+            print(f"Send error to {chat_id}: {e}")
+            return False
+    return False
+
+# Broadcasts are network-bound (one HTTPS round-trip per chat), so fan them out
+# over a small shared pool instead of sending one chat at a time.
+BROADCAST_POOL = ThreadPoolExecutor(max_workers=SEND_RATE)  # enough to keep the token bucket busy
+BROADCAST_TIMEOUT = 600  # seconds to wait for a whole broadcast to finish
+
+def broadcast(chat_ids, text, reply_markup_for):
+    """Send text to every chat id in parallel; return number of successful sends.
+    reply_markup_for(chat_id) returns the markup for that chat."""
+    with _store_lock:
+        chat_ids = list(chat_ids)
+    futures = [BROADCAST_POOL.submit(send_message_safe, cid, text, "Markdown", reply_markup_for(cid))
+               for cid in chat_ids]
+    done, _ = wait(futures, timeout=BROADCAST_TIMEOUT)
+    return sum(1 for f in done if not f.cancelled() and f.exception() is None and f.result())
 
 def send_daily_morning():
     """Send today's schedule to all users and groups at 06:00 Tashkent time"""
-    week = settings.get("current_week", "tepa")
-    today_en = today_tashkent_date().strftime("%A")
+    week = CURRENT_WEEK
+    today_en = _WEEKDAYS[today_tashkent_date().weekday()]
     if today_en == "Sunday":
         text = "🌞 *Yakshanba* — Bugun dars yo'q! 😎\nDam oling!"
     else:
         text = pretty_schedule_text(today_en, week)
-    # Send to individual users
-    sent_u = 0
-    for uid in list(users):
-        try:
-            send_message_safe(uid, text, reply_markup=main_reply_keyboard(uid))
-            sent_u += 1
-        except Exception:
-            pass
     # Send to groups (use inline "Bugun / Ertaga" buttons)
     inline = types.InlineKeyboardMarkup()
     inline.add(
         types.InlineKeyboardButton("📅 Bugun", callback_data=f"grp_bugun:{today_en}"),
         types.InlineKeyboardButton("📅 Ertaga", callback_data=f"grp_ertaga:{today_en}")
     )
-    sent_g = 0
-    for gid in list(groups):
-        try:
-            send_message_safe(gid, text, reply_markup=inline)
-            sent_g += 1
-        except Exception:
-            pass
+    sent_u = broadcast(users, text, broadcast_keyboard_for())
+    inline_json = inline.to_json()  # serialize once; telebot passes str markup through
+    sent_g = broadcast(groups, text, lambda gid: inline_json)
     # Notify admin
     try:
         bot.send_message(ADMIN_ID, f"📤 06:00: Ertalabki jadval yuborildi. Foydalanuvchilar: {len(users)}, Guruhlar: {len(groups)}. Yuborildi: users={sent_u}, groups={sent_g}")
@@ -224,13 +451,13 @@ def send_daily_morning():
 
 def send_daily_evening():
     """Send tomorrow's schedule at 18:00 Tashkent time to users and groups"""
-    week = settings.get("current_week", "tepa")
-    today_date = today_tashkent_date()
-    tomorrow_date = today_date + datetime.timedelta(days=1)
-    tomorrow_en = tomorrow_date.strftime("%A")
-    week_type = settings.get("current_week", "tepa")
+    tomorrow_date = today_tashkent_date() + datetime.timedelta(days=1)
+    tomorrow_en = _WEEKDAYS[tomorrow_date.weekday()]
+    wk = CURRENT_WEEK
     if settings.get("auto_switch_on_monday", True) and tomorrow_date.weekday() == 0:
-        week_type = "pastgi" if week_type == "tepa" else "tepa"
+        week_type = "pastgi" if wk == "tepa" else "tepa"
+    else:
+        week_type = wk
     if tomorrow_en == "Sunday":
         text = "🌞 *Yakshanba* — Ertaga dars yo'q! 😎\nDam oling!"
     else:
@@ -240,115 +467,124 @@ def send_daily_evening():
         types.InlineKeyboardButton("📅 Bugun", callback_data=f"grp_bugun:{tomorrow_en}"),
         types.InlineKeyboardButton("📅 Ertaga", callback_data=f"grp_ertaga:{tomorrow_en}")
     )
-    sent_u = 0
-    for uid in list(users):
-        try:
-            send_message_safe(uid, text, reply_markup=main_reply_keyboard(uid))
-            sent_u += 1
-        except Exception:
-            pass
-    sent_g = 0
-    for gid in list(groups):
-        try:
-            send_message_safe(gid, text, reply_markup=inline)
-            sent_g += 1
-        except Exception:
-            pass
+    sent_u = broadcast(users, text, broadcast_keyboard_for())
+    inline_json = inline.to_json()  # serialize once; telebot passes str markup through
+    sent_g = broadcast(groups, text, lambda gid: inline_json)
     try:
         bot.send_message(ADMIN_ID, f"📤 18:00: Ertangi jadval yuborildi. users={sent_u}, groups={sent_g}")
     except Exception:
         pass
 
-def seconds_until_target(hour, minute=0):
-    """Return seconds until next target time at Tashkent timezone."""
+def next_target_epoch(hour, minute=0):
+    """Return epoch timestamp of the next hour:minute in Tashkent timezone."""
     now = now_tashkent()
     target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
     if now >= target:
         target = target + datetime.timedelta(days=1)
-    return (target - now).total_seconds()
+    return target.timestamp()
+
+# Single scheduler thread: a heap of (epoch_ts, seq, callback, args) entries.
+# One sleeping thread serves every timed event instead of one Timer per event.
+_sched_heap = []
+_sched_cv = threading.Condition()
+_sched_seq = itertools.count()  # tie-breaker so callbacks are never compared
+SCHED_MAX_SLEEP = 60  # seconds
+# Jobs run off the scheduler thread; kept separate from BROADCAST_POOL because
+# the jobs themselves wait on broadcasts submitted to that pool.
+SCHED_POOL = ThreadPoolExecutor(max_workers=2)
+
+def schedule_at(ts, callback, args=()):
+    """Run callback(*args) at epoch timestamp ts."""
+    with _sched_cv:
+        heapq.heappush(_sched_heap, (ts, next(_sched_seq), callback, args))
+        _sched_cv.notify()
+
+def _run_job(callback, args):
+    try:
+        callback(*args)
+    except Exception as e:
+        print("Scheduled job error:", e)
 
-def daily_scheduler_loop():
-    """Thread: waits until next 06:00 and 18:00 (Tashkent) and sends messages"""
+def scheduler_loop():
+    """Thread: sleeps until the earliest heap entry is due and dispatches it"""
     while True:
-        sec6 = seconds_until_target(6, 0)
-        sec18 = seconds_until_target(18, 0)
-        # choose next event
-        if sec6 <= sec18:
-            time.sleep(sec6)
-            if settings.get("send_6am", True):
-                # If it's Monday morning and auto switch enabled: switch week before sending
-                today = today_tashkent_date()
-                if settings.get("auto_switch_on_monday", True) and today.weekday() == 0:
-                    settings["current_week"] = "pastgi" if settings.get("current_week","tepa") == "tepa" else "tepa"
-                    save_json(SETTINGS_FILE, settings)
-                send_daily_morning()
-                schedule_reminders_for_today()
-        else:
-            time.sleep(sec18)
-            if settings.get("send_18pm", True):
-                send_daily_evening()
+        with _sched_cv:
+            if not _sched_heap:
+                _sched_cv.wait()
+                continue
+            dt = _sched_heap[0][0] - time.time()
+            if dt > 0:
+                # deadlines are wall-clock epochs; re-check at least every
+                # SCHED_MAX_SLEEP so clock jumps / suspend can't delay a job
+                _sched_cv.wait(min(dt, SCHED_MAX_SLEEP))
+                continue
+            _, _, callback, args = heapq.heappop(_sched_heap)
+        SCHED_POOL.submit(_run_job, callback, args)
+
+def morning_job():
+    """06:00 (Tashkent): optional Monday week switch, daily schedule, today's reminders"""
+    schedule_at(next_target_epoch(6), morning_job)
+    if settings.get("send_6am", True):
+        # If it's Monday morning and auto switch enabled: switch week before sending
+        today = today_tashkent_date()
+        if settings.get("auto_switch_on_monday", True) and today.weekday() == 0:
+            switch_current_week()
+        send_daily_morning()
+        schedule_reminders_for_today()
+
+def evening_job():
+    """18:00 (Tashkent): tomorrow's schedule"""
+    schedule_at(next_target_epoch(18), evening_job)
+    if settings.get("send_18pm", True):
+        send_daily_evening()
 
 # Reminder scheduling for individual users
 def schedule_reminders_for_today():
-    """Schedule reminders (threading.Timer) for times in today's schedule for individuals only (Tashkent time)."""
-    today_en = today_tashkent_date().strftime("%A")
+    """Schedule reminders (scheduler heap) for times in today's schedule for individuals only (Tashkent time)."""
+    today_en = _WEEKDAYS[today_tashkent_date().weekday()]
     if today_en == "Sunday":
         return
-    week = settings.get("current_week", "tepa")
-    jadval_text = schedules.get(week, {}).get(today_en, "")
-    times = parse_times_from_text(jadval_text)
+    week = CURRENT_WEEK
+    lessons = _schedule_index.get(week, _EMPTY).get(today_en, _EMPTY)
     minutes_before = int(settings.get("reminder_minutes_before", 15))
     now = now_tashkent()
-    for t in times:
+    for t in lessons:
         try:
             hh, mm = map(int, t.split(":"))
             # Build a timezone-aware lesson datetime in Tashkent
             lesson_naive = datetime.datetime(now.year, now.month, now.day, hh, mm)
-            lesson_dt = TASHKENT_TZ.localize(lesson_naive)
+            lesson_dt = lesson_naive.replace(tzinfo=TASHKENT_TZ)
             remind_dt = lesson_dt - datetime.timedelta(minutes=minutes_before)
-            delay = (remind_dt - now).total_seconds()
-            if delay <= 0:
+            if remind_dt <= now:
                 continue
-            threading.Timer(delay, reminder_send_for_time, args=(t,)).start()
+            schedule_at(remind_dt.timestamp(), reminder_send_for_time, (t,))
         except Exception as e:
             print("Reminder schedule error:", e)
 
 def reminder_send_for_time(time_str):
     """Send reminder to all individual users (not groups) at the scheduled Tashkent time."""
-    week = settings.get("current_week", "tepa")
-    today_en = today_tashkent_date().strftime("%A")
-    jadval_text = schedules.get(week, {}).get(today_en, "")
-    subject = None
-    for line in jadval_text.splitlines():
-        if time_str in line:
-            parts = line.split("-", 1)
-            if len(parts) >= 2:
-                subject = parts[1].strip()
-            break
+    week = CURRENT_WEEK
+    today_en = _WEEKDAYS[today_tashkent_date().weekday()]
+    subject = _schedule_index.get(week, _EMPTY).get(today_en, _EMPTY).get(time_str)
     if subject:
         msg = f"🔔 *Eslatma!* `{time_str}` da *{subject}* boshlanadi. Tayyorlaning!"
     else:
         msg = f"🔔 *Eslatma!* `{time_str}` da dars boshlanadi. Tayyorlaning!"
-    for uid in list(users):
-        try:
-            send_message_safe(uid, msg, reply_markup=main_reply_keyboard(uid))
-        except Exception:
-            pass
+    broadcast(users, msg, broadcast_keyboard_for())
 
 # ========================
 # Keyboards & inline nav
 # ========================
-def main_reply_keyboard(user_id, chat_id=None):
+def _build_main_keyboard(with_admin):
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
     buttons = [types.KeyboardButton(v) for v in EN_TO_UZ_BTN.values()]
     kb.add(*buttons)
     kb.add(types.KeyboardButton("📅 Bugun"), types.KeyboardButton("📅 Ertaga"))
-    # Add admin panel if user is bot-global admin or chat admin
-    if user_id in settings.get("admins", []) or (chat_id and is_user_admin_in_chat(chat_id, user_id)):
+    if with_admin:
         kb.add(types.KeyboardButton("🧠 Admin panel"))
     return kb
 
-def admin_reply_keyboard():
+def _build_admin_keyboard():
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     kb.add("📋 Jadvalni ko‘rish", "✏️ Jadvalni tahrirlash")
     kb.add("➕ Jadval qo‘shish", "🗑 Jadval o‘chirish")
@@ -358,10 +594,52 @@ def admin_reply_keyboard():
     kb.add("⬅️ Orqaga")
     return kb
 
+# Keyboards never change at runtime, so build them once and share them
+_KB_USER = _build_main_keyboard(with_admin=False)
+_KB_ADMIN = _build_main_keyboard(with_admin=True)
+_KB_ADMIN_PANEL = _build_admin_keyboard()
+# admin wizard steps: week choice and school-day choice
+_WEEK_BTNS = frozenset({"Tepa hafta", "Pastgi hafta"})
+_WEEK_KB = types.ReplyKeyboardMarkup(resize_keyboard=True)
+_WEEK_KB.add("Tepa hafta", "Pastgi hafta")
+_WEEK_KB.add("⬅️ Orqaga")
+_DAY_KB = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
+_DAY_KB.add(*(EN_TO_UZ_BTN[d] for d in DAYS))
+_DAY_KB.add("⬅️ Orqaga")
+# JSON forms for broadcasts, so N sends don't re-serialize the same markup
+_KB_USER_JSON = _KB_USER.to_json()
+_KB_ADMIN_JSON = _KB_ADMIN.to_json()
+_day_nav_cache = {}  # (day_en, week_type) -> InlineKeyboardMarkup
+
+def main_reply_keyboard(user_id, chat_id=None):
+    # Add admin panel if user is bot-global admin or chat admin.
+    # Private chat id == user id, so only group chats need the API lookup.
+    if user_id in _admins_set or (chat_id and chat_id != user_id and is_user_admin_in_chat(chat_id, user_id)):
+        return _KB_ADMIN
+    return _KB_USER
+
+def broadcast_keyboard_for():
+    """Return uid -> pre-serialized main keyboard for a broadcast; the admin set is read once."""
+    admins = _admins_set
+    return lambda uid: _KB_ADMIN_JSON if uid in admins else _KB_USER_JSON
+
+def admin_reply_keyboard():
+    return _KB_ADMIN_PANEL
+
 def inline_day_nav(day_en, week_type):
     """Inline keyboard with left/right and today/weekly (with clear icons)"""
+    key = (day_en, week_type)
+    kb = _day_nav_cache.get(key)
+    if kb is None:
+        kb = _build_day_nav(day_en, week_type)
+        # callback data is client-supplied: only cache the real week types
+        if week_type in ("tepa", "pastgi"):
+            _day_nav_cache[key] = kb
+    return kb
+
+def _build_day_nav(day_en, week_type):
     kb = types.InlineKeyboardMarkup()
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    days = _WEEKDAYS
     idx = days.index(day_en)
     prev_day = days[(idx - 1) % len(days)]
     next_day = days[(idx + 1) % len(days)]
@@ -386,11 +664,13 @@ def handle_start(m):
     # Add to users if private chat
     if m.chat.type == "private":
         if chat_id not in users:
-            users.append(chat_id)
-            save_json(USERS_FILE, users)
+            with _store_lock:
+                users.add(chat_id)
+                _recent_users.append(chat_id)
+            mark_dirty("users")
         # send today's schedule automatically on /start
-        today_en = today_tashkent_date().strftime("%A")
-        week = settings.get("current_week", "tepa")
+        today_en = _WEEKDAYS[today_tashkent_date().weekday()]
+        week = CURRENT_WEEK
         text = pretty_schedule_text(today_en, week)
         send_message_safe(chat_id, "👋 *Assalomu alaykum!* Men — Raspisanie boti 🤖\nQuyidagi tugmalardan foydalaning:", reply_markup=main_reply_keyboard(uid, chat_id))
         send_message_safe(chat_id, text, reply_markup=main_reply_keyboard(uid, chat_id))
@@ -398,12 +678,13 @@ def handle_start(m):
     # If group, welcome and add to groups and send today's schedule to the group
     if m.chat.type in ("group", "supergroup"):
         if chat_id not in groups:
-            groups.append(chat_id)
-            save_json(GROUPS_FILE, groups)
+            with _store_lock:
+                groups.add(chat_id)
+            mark_dirty("groups")
         bot.send_message(chat_id, "👋 Men guruhda ishlashga tayyorman! Adminlar /start orqali admin panelini ochishlari mumkin.")
         # send today's schedule to group automatically
-        today_en = today_tashkent_date().strftime("%A")
-        week = settings.get("current_week", "tepa")
+        today_en = _WEEKDAYS[today_tashkent_date().weekday()]
+        week = CURRENT_WEEK
         text = pretty_schedule_text(today_en, week)
         inline = types.InlineKeyboardMarkup()
         inline.add(
@@ -418,11 +699,12 @@ def on_new_members(m):
     # if bot added to group, store group id
     for u in m.new_chat_members:
         try:
-            if u.id == bot.get_me().id:
+            if u.id == BOT_ID:
                 gid = m.chat.id
                 if gid not in groups:
-                    groups.append(gid)
-                    save_json(GROUPS_FILE, groups)
+                    with _store_lock:
+                        groups.add(gid)
+                    mark_dirty("groups")
                 bot.send_message(gid, "👋 Men guruhga qo‘shildim — Raspisanie funktsiyalari hozir faqat adminlar tomonidan boshqarilishi mumkin.")
         except Exception:
             pass
@@ -450,12 +732,11 @@ def cmd_bugun(m):
 def cmd_ertaga(m):
     handle_ertaga(m)
 
-@bot.message_handler(func=lambda m: m.text == "📅 Bugun")
 def handle_bugun(m):
     chat_id = m.chat.id
     uid = m.from_user.id
-    today_en = today_tashkent_date().strftime("%A")
-    week = settings.get("current_week", "tepa")
+    today_en = _WEEKDAYS[today_tashkent_date().weekday()]
+    week = CURRENT_WEEK
     text = pretty_schedule_text(today_en, week)
     # if in group, show inline nav
     if m.chat.type in ("group", "supergroup"):
@@ -464,15 +745,14 @@ def handle_bugun(m):
     else:
         send_message_safe(chat_id, text, reply_markup=main_reply_keyboard(uid, chat_id))
 
-@bot.message_handler(func=lambda m: m.text == "📅 Ertaga")
 def handle_ertaga(m):
     chat_id = m.chat.id
     uid = m.from_user.id
     today_date = today_tashkent_date()
     tomorrow_date = (today_date + datetime.timedelta(days=1))
-    tomorrow = tomorrow_date.strftime("%A")
+    tomorrow = _WEEKDAYS[tomorrow_date.weekday()]
     # compute week type possibly switching if Monday auto switch true
-    week = settings.get("current_week", "tepa")
+    week = CURRENT_WEEK
     if settings.get("auto_switch_on_monday", True) and tomorrow_date.weekday() == 0:
         week = "pastgi" if week == "tepa" else "tepa"
     text = pretty_schedule_text(tomorrow, week)
@@ -483,14 +763,13 @@ def handle_ertaga(m):
         send_message_safe(chat_id, text, reply_markup=main_reply_keyboard(uid, chat_id))
 
 # Handler for day buttons (private and group)
-@bot.message_handler(func=lambda m: m.text in EN_TO_UZ_BTN.values())
 def handle_day_buttons(m):
     chat_id = m.chat.id
     uid = m.from_user.id
     day_en = UZ_BTN_TO_EN.get(m.text)
     if not day_en:
         return
-    week = settings.get("current_week", "tepa")
+    week = CURRENT_WEEK
     text = pretty_schedule_text(day_en, week)
     if m.chat.type in ("group", "supergroup"):
         kb = inline_day_nav(day_en, week)
@@ -498,9 +777,49 @@ def handle_day_buttons(m):
     else:
         send_message_safe(chat_id, text, reply_markup=main_reply_keyboard(uid, chat_id))
 
+# One registered handler for all fixed-text buttons: a dict lookup per message
+# instead of a chain of filter lambdas. Admin buttons are added further below.
+_TEXT_ROUTES = {
+    "📅 Bugun": handle_bugun,
+    "📅 Ertaga": handle_ertaga,
+    **{v: handle_day_buttons for v in EN_TO_UZ_BTN.values()},
+}
+
+@bot.message_handler(func=lambda m: m.text in _TEXT_ROUTES)
+def route_text(m):
+    _TEXT_ROUTES[m.text](m)
+
 # ========================
 # Callbacks: inline navigation and group bugun/ertaga
 # ========================
+# Last text we put into each (chat_id, message_id), bounded LRU. Lets repeated
+# presses of the same button skip the edit round-trip entirely.
+LAST_EDIT_MAX = 2048
+_last_edit = OrderedDict()
+_last_edit_lock = threading.Lock()
+
+def edit_message_safe(chat_id, message_id, text, reply_markup=None):
+    """Edit a message in place; skip if unchanged, resend if the edit fails."""
+    key = (chat_id, message_id)
+    with _last_edit_lock:
+        if _last_edit.get(key) == text:
+            _last_edit.move_to_end(key)
+            return
+    try:
+        bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id, parse_mode="Markdown", reply_markup=reply_markup)
+    except ApiTelegramException as e:
+        if "message is not modified" not in str(e.description):
+            send_message_safe(chat_id, text, reply_markup=reply_markup)
+            return
+    except Exception:
+        send_message_safe(chat_id, text, reply_markup=reply_markup)
+        return
+    with _last_edit_lock:
+        _last_edit[key] = text
+        _last_edit.move_to_end(key)
+        if len(_last_edit) > LAST_EDIT_MAX:
+            _last_edit.popitem(last=False)
+
 @bot.callback_query_handler(func=lambda cq: True)
 def callback_handler(cq):
     data = cq.data
@@ -511,26 +830,20 @@ def callback_handler(cq):
     if data.startswith("grp_bugun:") or data.startswith("grp_ertaga:"):
         typ, day = data.split(":", 1)
         if typ == "grp_bugun":
-            week = settings.get("current_week", "tepa")
+            week = CURRENT_WEEK
             text = pretty_schedule_text(day, week)
             kb = inline_day_nav(day, week)
-            try:
-                bot.edit_message_text(text=text, chat_id=cid, message_id=cq.message.message_id, parse_mode="Markdown", reply_markup=kb)
-            except Exception:
-                send_message_safe(cid, text, reply_markup=kb)
+            edit_message_safe(cid, cq.message.message_id, text, reply_markup=kb)
         else:  # grp_ertaga
             today_date = today_tashkent_date()
             tomorrow_date = (today_date + datetime.timedelta(days=1))
-            tomorrow_en = tomorrow_date.strftime("%A")
-            week = settings.get("current_week", "tepa")
+            tomorrow_en = _WEEKDAYS[tomorrow_date.weekday()]
+            week = CURRENT_WEEK
             if settings.get("auto_switch_on_monday", True) and tomorrow_date.weekday() == 0:
                 week = "pastgi" if week == "tepa" else "tepa"
             text = pretty_schedule_text(tomorrow_en, week)
             kb = inline_day_nav(tomorrow_en, week)
-            try:
-                bot.edit_message_text(text=text, chat_id=cid, message_id=cq.message.message_id, parse_mode="Markdown", reply_markup=kb)
-            except Exception:
-                send_message_safe(cid, text, reply_markup=kb)
+            edit_message_safe(cid, cq.message.message_id, text, reply_markup=kb)
         bot.answer_callback_query(cq.id)
         return
 
@@ -540,19 +853,9 @@ def callback_handler(cq):
         if len(parts) >= 2:
             action = parts[1]
             if action == "weekly":
-                week = parts[2] if len(parts) > 2 else settings.get("current_week", "tepa")
-                header = f"📅 *{week.capitalize()} hafta* — Haftalik jadval:\n\n"
-                body_parts = []
-                for d in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]:
-                    j = schedules.get(week, {}).get(d, "—")
-                    day_label = EN_TO_UZ_BTN.get(d, d)
-                    body = f"🗓 *{day_label}*\n{j}\n"
-                    body_parts.append(body)
-                full = header + "\n".join(body_parts)
-                try:
-                    bot.edit_message_text(text=full, chat_id=cid, message_id=cq.message.message_id, parse_mode="Markdown", reply_markup=None)
-                except Exception:
-                    send_message_safe(cid, full)
+                week = parts[2] if len(parts) > 2 else CURRENT_WEEK
+                full = weekly_schedule_text(week)
+                edit_message_safe(cid, cq.message.message_id, full, reply_markup=None)
                 bot.answer_callback_query(cq.id)
                 return
             if action == "noop":
@@ -560,13 +863,10 @@ def callback_handler(cq):
                 return
             # else action is a day name
             day = action
-            week_type = parts[2] if len(parts) > 2 else settings.get("current_week", "tepa")
+            week_type = parts[2] if len(parts) > 2 else CURRENT_WEEK
             text = pretty_schedule_text(day, week_type)
             kb = inline_day_nav(day, week_type)
-            try:
-                bot.edit_message_text(text=text, chat_id=cid, message_id=cq.message.message_id, parse_mode="Markdown", reply_markup=kb)
-            except Exception:
-                send_message_safe(cid, text, reply_markup=kb)
+            edit_message_safe(cid, cq.message.message_id, text, reply_markup=kb)
             bot.answer_callback_query(cq.id)
             return
 
@@ -575,16 +875,22 @@ def callback_handler(cq):
 # ========================
 def user_is_allowed_as_admin(chat_id, user_id):
     # allowed if user is global admin in settings OR chat admin in that chat
-    try:
-        if user_id in settings.get("admins", []):
-            return True
-        if chat_id in groups:
-            return is_user_admin_in_chat(chat_id, user_id)
-    except Exception:
-        pass
+    if user_id in _admins_set:
+        return True
+    if chat_id in groups:
+        # the only call that can fail; it catches its own API errors
+        return is_user_admin_in_chat(chat_id, user_id)
     return False
 
-@bot.message_handler(func=lambda m: m.text == "🧠 Admin panel")
+def admin_only(fn):
+    """Handler decorator: silently ignore messages from non-admins."""
+    @functools.wraps(fn)
+    def wrapper(m, *args, **kwargs):
+        if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
+            return
+        return fn(m, *args, **kwargs)
+    return wrapper
+
 def open_admin_panel(m):
     chat_id = m.chat.id
     uid = m.from_user.id
@@ -598,220 +904,228 @@ def open_admin_panel(m):
         bot.send_message(chat_id, "🧠 *Admin panel (shaxsiy)*\nQuyidagi tugmalardan tanlang:", parse_mode="Markdown", reply_markup=kb)
 
 # Admin handlers (gated)
-@bot.message_handler(func=lambda m: m.text == "📋 Jadvalni ko‘rish")
+@admin_only
 def admin_view(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    week = settings.get("current_week", "tepa")
-    text = f"📅 *{week.capitalize()} hafta jadvali:*\n\n"
-    for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]:
-        j = schedules.get(week, {}).get(day, "—")
-        text += f"🗓 *{EN_TO_UZ_BTN[day]}*\n{j}\n\n"
+    week = CURRENT_WEEK
+    week_days = schedules.get(week, _EMPTY)
+    parts = [f"📅 *{week.capitalize()} hafta jadvali:*\n\n"]
+    parts.extend(f"{_DAY_HEADINGS[d]}{week_days.get(d, '—')}\n\n" for d in DAYS)
+    text = "".join(parts)
     send_message_safe(m.chat.id, text, reply_markup=main_reply_keyboard(m.from_user.id, m.chat.id))
 
-@bot.message_handler(func=lambda m: m.text == "✏️ Jadvalni tahrirlash")
-def admin_edit_start(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add("Tepa hafta", "Pastgi hafta")
-    kb.add("⬅️ Orqaga")
-    bot.send_message(m.chat.id, "📝 Qaysi haftani tahrirlamoqchisiz?", reply_markup=kb)
+# Which wizard showed the week keyboard: (chat_id, user_id) -> "edit" | "add" | "delete"
+_week_action = {}
 
-@bot.message_handler(func=lambda m: m.text in ["Tepa hafta", "Pastgi hafta"])
-def admin_edit_choose_week(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
+@bot.message_handler(func=lambda m, s=_WEEK_BTNS: m.text in s)
+@admin_only
+def admin_choose_week(m):
+    action = _week_action.pop((m.chat.id, m.from_user.id), "edit")
     week = "tepa" if "Tepa" in m.text else "pastgi"
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-    for d in ["📘 Dushanba", "📗 Seshanba", "📙 Chorshanba", "📒 Payshanba", "📔 Juma", "📕 Shanba"]:
-        kb.add(d)
-    kb.add("⬅️ Orqaga")
-    bot.send_message(m.chat.id, f"✍️ {m.text} — Qaysi kunni tahrirlaysiz?", reply_markup=kb)
+    if action == "add":
+        admin_add_choose_week(m, week)
+    elif action == "delete":
+        admin_delete_choose_week(m, week)
+    else:
+        admin_edit_choose_week(m, week)
+
+@admin_only
+def admin_edit_start(m):
+    _week_action[(m.chat.id, m.from_user.id)] = "edit"
+    bot.send_message(m.chat.id, "📝 Qaysi haftani tahrirlamoqchisiz?", reply_markup=_WEEK_KB)
+
+def admin_edit_choose_week(m, week):
+    bot.send_message(m.chat.id, f"✍️ {m.text} — Qaysi kunni tahrirlaysiz?", reply_markup=_DAY_KB)
     bot.register_next_step_handler(m, admin_edit_day_step, week)
 
+@admin_only
 def admin_edit_day_step(m, week):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     if m.text == "⬅️ Orqaga":
         bot.send_message(m.chat.id, "🔙 Ortga", reply_markup=admin_reply_keyboard())
         return
-    if m.text not in UZ_BTN_TO_EN:
+    info = BTN_INFO.get(m.text)
+    if info is None:
         bot.send_message(m.chat.id, "❌ Noto'g'ri tugma, bekor qilindi.", reply_markup=admin_reply_keyboard())
         return
-    day = UZ_BTN_TO_EN[m.text]
-    bot.send_message(m.chat.id, f"✍️ {m.text} uchun yangi jadvalni matn ko'rinishida yuboring.\nHar qator `HH:MM - Fan nomi` formatida bo'lsin.")
+    day, label = info
+    bot.send_message(m.chat.id, f"✍️ {label} uchun yangi jadvalni matn ko'rinishida yuboring.\nHar qator `HH:MM - Fan nomi` formatida bo'lsin.")
     bot.register_next_step_handler(m, admin_save_day, week, day)
 
+@admin_only
 def admin_save_day(m, week, day):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     text = m.text.strip()
-    schedules.setdefault(week, {})[day] = text
-    save_json(SCHEDULES_FILE, schedules)
+    if schedules.get(week, _EMPTY).get(day) == text:
+        bot.send_message(m.chat.id, "ℹ️ O'zgarish yo'q", reply_markup=admin_reply_keyboard())
+        return
+    with _store_lock:
+        schedules.setdefault(week, {})[day] = text
+        invalidate_schedule_caches()
+    mark_dirty("schedules")
     bot.send_message(m.chat.id, f"✅ Jadval yangilandi: *{EN_TO_UZ_BTN[day]}* ({'Tepa' if week=='tepa' else 'Pastgi'} hafta)",
                      parse_mode="Markdown", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "➕ Jadval qo‘shish")
+@admin_only
 def admin_add_schedule(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add("Tepa hafta", "Pastgi hafta", "⬅️ Orqaga")
-    bot.send_message(m.chat.id, "➕ Qaysi haftaga yangi jadval qo'shmoqchisiz?", reply_markup=kb)
+    _week_action[(m.chat.id, m.from_user.id)] = "add"
+    bot.send_message(m.chat.id, "➕ Qaysi haftaga yangi jadval qo'shmoqchisiz?", reply_markup=_WEEK_KB)
 
-@bot.message_handler(func=lambda m: m.text in ["➕ Jadval qo‘shish", "Tepa hafta", "Pastgi hafta"])
-def admin_add_choose_week(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    if m.text in ["Tepa hafta", "Pastgi hafta"]:
-        week = "tepa" if "Tepa" in m.text else "pastgi"
-        kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-        for d in ["📘 Dushanba", "📗 Seshanba", "📙 Chorshanba", "📒 Payshanba", "📔 Juma", "📕 Shanba"]:
-            kb.add(d)
-        kb.add("⬅️ Orqaga")
-        bot.send_message(m.chat.id, "➕ Qaysi kun uchun qo'shmoqchisiz?", reply_markup=kb)
-        bot.register_next_step_handler(m, admin_add_day_step, week)
+def admin_add_choose_week(m, week):
+    bot.send_message(m.chat.id, "➕ Qaysi kun uchun qo'shmoqchisiz?", reply_markup=_DAY_KB)
+    bot.register_next_step_handler(m, admin_add_day_step, week)
 
+@admin_only
 def admin_add_day_step(m, week):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    if m.text not in UZ_BTN_TO_EN:
+    info = BTN_INFO.get(m.text)
+    if info is None:
         bot.send_message(m.chat.id, "❌ Bekor qilindi.", reply_markup=admin_reply_keyboard())
         return
-    day = UZ_BTN_TO_EN[m.text]
+    day, _ = info
     bot.send_message(m.chat.id, "➕ Yangi jadval matnini kiriting:")
     bot.register_next_step_handler(m, admin_add_save, week, day)
 
+@admin_only
 def admin_add_save(m, week, day):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
+    text = m.text.strip()
+    if schedules.get(week, _EMPTY).get(day) == text:
+        bot.send_message(m.chat.id, "ℹ️ O'zgarish yo'q", reply_markup=admin_reply_keyboard())
         return
-    schedules.setdefault(week, {})[day] = m.text.strip()
-    save_json(SCHEDULES_FILE, schedules)
+    with _store_lock:
+        schedules.setdefault(week, {})[day] = text
+        invalidate_schedule_caches()
+    mark_dirty("schedules")
     bot.send_message(m.chat.id, f"✅ Qo‘shildi: {EN_TO_UZ_BTN[day]}", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "🗑 Jadval o‘chirish")
+@admin_only
 def admin_delete_start(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add("Tepa hafta", "Pastgi hafta", "⬅️ Orqaga")
-    bot.send_message(m.chat.id, "🗑 Qaysi haftadan o'chirmoqchisiz?", reply_markup=kb)
+    _week_action[(m.chat.id, m.from_user.id)] = "delete"
+    bot.send_message(m.chat.id, "🗑 Qaysi haftadan o'chirmoqchisiz?", reply_markup=_WEEK_KB)
 
-@bot.message_handler(func=lambda m: m.text in ["Tepa hafta", "Pastgi hafta"] and m.reply_to_message is None)
-def admin_delete_choose_week(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    week = "tepa" if "Tepa" in m.text else "pastgi"
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    for d in ["📘 Dushanba", "📗 Seshanba", "📙 Chorshanba", "📒 Payshanba", "📔 Juma", "📕 Shanba"]:
-        kb.add(d)
-    kb.add("⬅️ Orqaga")
-    bot.send_message(m.chat.id, "🗑 Qaysi kunni o'chirmoqchisiz?", reply_markup=kb)
+def admin_delete_choose_week(m, week):
+    bot.send_message(m.chat.id, "🗑 Qaysi kunni o'chirmoqchisiz?", reply_markup=_DAY_KB)
     bot.register_next_step_handler(m, admin_delete_day_step, week)
 
+@admin_only
 def admin_delete_day_step(m, week):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    if m.text not in UZ_BTN_TO_EN:
+    info = BTN_INFO.get(m.text)
+    if info is None:
         bot.send_message(m.chat.id, "❌ Bekor qilindi.", reply_markup=admin_reply_keyboard())
         return
-    day = UZ_BTN_TO_EN[m.text]
-    if day in schedules.get(week, {}):
-        del schedules[week][day]
-        save_json(SCHEDULES_FILE, schedules)
-        bot.send_message(m.chat.id, f"🗑 {EN_TO_UZ_BTN[day]} o'chirildi.", reply_markup=admin_reply_keyboard())
+    day, label = info
+    if day in schedules.get(week, _EMPTY):
+        with _store_lock:
+            schedules[week].pop(day, None)
+            invalidate_schedule_caches()
+        mark_dirty("schedules")
+        bot.send_message(m.chat.id, f"🗑 {label} o'chirildi.", reply_markup=admin_reply_keyboard())
     else:
         bot.send_message(m.chat.id, "❌ Bu kun uchun jadval topilmadi.", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "🔁 Haftani almashtirish")
+@admin_only
 def admin_switch_week(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    settings["current_week"] = "pastgi" if settings.get("current_week", "tepa") == "tepa" else "tepa"
-    save_json(SETTINGS_FILE, settings)
-    bot.send_message(m.chat.id, f"🔄 Hafta turi o'zgardi. Hozir: *{settings['current_week'].capitalize()} hafta*", parse_mode="Markdown", reply_markup=admin_reply_keyboard())
+    week = switch_current_week()
+    bot.send_message(m.chat.id, f"🔄 Hafta turi o'zgardi. Hozir: *{week.capitalize()} hafta*", parse_mode="Markdown", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "📆 Hozirgi hafta turi")
+@admin_only
 def admin_current_week(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
-    bot.send_message(m.chat.id, f"📅 Hozir: *{settings.get('current_week','tepa').capitalize()} hafta*", parse_mode="Markdown", reply_markup=admin_reply_keyboard())
+    bot.send_message(m.chat.id, f"📅 Hozir: *{CURRENT_WEEK.capitalize()} hafta*", parse_mode="Markdown", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "📊 Statistika")
+@admin_only
 def admin_stats(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     total_users = len(users)
     total_groups = len(groups)
-    last_10 = users[-10:] if users else []
+    last_10 = list(_recent_users)
     text = f"📊 *Statistika:*\n\n👥 Foydalanuvchilar: *{total_users}*\n👥 Guruhlar: *{total_groups}*\n\n🆔 Oxirgi 10 foydalanuvchi: `{last_10}`"
     bot.send_message(m.chat.id, text, parse_mode="Markdown", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "📤 Barcha foydalanuvchilarga xabar")
+@admin_only
 def admin_broadcast_start(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     bot.send_message(m.chat.id, "📨 Yubormoqchi bo‘lgan xabaringizni kiriting:")
     bot.register_next_step_handler(m, admin_broadcast_send)
 
+@admin_only
 def admin_broadcast_send(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     text = m.text
-    count = 0
-    for uid in list(users):
-        try:
-            send_message_safe(uid, f"📢 *ADMIN:* \n\n{text}", reply_markup=main_reply_keyboard(uid))
-            count += 1
-        except Exception:
-            pass
-    bot.send_message(m.chat.id, f"✅ Xabar {count} foydalanuvchiga yuborildi.", reply_markup=admin_reply_keyboard())
+    chat_id = m.chat.id
+    # Run in the background so the admin's chat isn't blocked for the whole broadcast
+    def job():
+        count = broadcast(users, f"📢 *ADMIN:* \n\n{text}", broadcast_keyboard_for())
+        send_message_safe(chat_id, f"✅ Xabar {count} foydalanuvchiga yuborildi.", parse_mode=None, reply_markup=admin_reply_keyboard())
+    threading.Thread(target=job, daemon=True).start()
+
+def _write_backup(path, payload):
+    """Write the archive copy atomically (temp file + os.replace)."""
+    try:
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except Exception as e:
+        print("Backup write error:", e)
 
-@bot.message_handler(func=lambda m: m.text == "💾 Backup yaratish")
+@admin_only
 def admin_backup(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     ts = now_tashkent().strftime("%Y%m%d_%H%M%S")
     backup_file = BACKUP_DIR / f"schedules_backup_{ts}.json"
-    save_json(backup_file, schedules)
+    with _store_lock:
+        payload = _dumps(schedules)
+    # upload from memory; the archive copy is written to disk in parallel
+    # (non-daemon, so exit never leaves a half-written archive)
+    threading.Thread(target=_write_backup, args=(backup_file, payload)).start()
+    buf = io.BytesIO(payload)
+    buf.name = backup_file.name
     try:
-        with open(backup_file, "rb") as f:
-            bot.send_document(m.chat.id, f, caption=f"💾 Backup: {backup_file.name}", reply_markup=admin_reply_keyboard())
+        bot.send_document(m.chat.id, buf, caption=f"💾 Backup: {backup_file.name}", reply_markup=admin_reply_keyboard())
     except Exception as e:
         bot.send_message(m.chat.id, f"❌ Backup yuborishda xato: {e}", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "👥 Admin qo'sh / o'chirish")
+@admin_only
 def admin_manage_admins(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
     bot.send_message(m.chat.id, "🧑‍💼 Iltimos, qo'shmoq/ochirmoqchi bo'lgan admin ID sini yuboring (raqam):")
     bot.register_next_step_handler(m, admin_manage_admins_step)
 
+@admin_only
 def admin_manage_admins_step(m):
-    if not user_is_allowed_as_admin(m.chat.id, m.from_user.id):
-        return
+    global _admins_set
     try:
         aid = int(m.text.strip())
     except Exception:
         bot.send_message(m.chat.id, "❌ Noto'g'ri format. Iltimos faqat raqam yuboring.", reply_markup=admin_reply_keyboard())
         return
-    admins = settings.get("admins", [])
-    if aid in admins:
-        admins.remove(aid)
+    with _store_lock:
+        admins = settings.get("admins", [])
+        removed = aid in admins
+        if removed:
+            admins.remove(aid)
+        else:
+            admins.append(aid)
         settings["admins"] = admins
-        save_json(SETTINGS_FILE, settings)
+        _admins_set = frozenset(admins)
+    mark_dirty("settings")
+    if removed:
         bot.send_message(m.chat.id, f"🗑 Admin (ID: {aid}) o'chirildi.", reply_markup=admin_reply_keyboard())
     else:
-        admins.append(aid)
-        settings["admins"] = admins
-        save_json(SETTINGS_FILE, settings)
         bot.send_message(m.chat.id, f"➕ Yangi admin (ID: {aid}) qo'shildi.", reply_markup=admin_reply_keyboard())
 
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga")
 def back_to_main(m):
+    # leaving a wizard: forget which one asked for a week button
+    _week_action.pop((m.chat.id, m.from_user.id), None)
     send_message_safe(m.chat.id, "🏠 Asosiy menyu:", reply_markup=main_reply_keyboard(m.from_user.id, m.chat.id))
 
+# Admin menu buttons go through the same route_text dispatcher
+_TEXT_ROUTES.update({
+    "🧠 Admin panel": open_admin_panel,
+    "📋 Jadvalni ko‘rish": admin_view,
+    "✏️ Jadvalni tahrirlash": admin_edit_start,
+    "➕ Jadval qo‘shish": admin_add_schedule,
+    "🗑 Jadval o‘chirish": admin_delete_start,
+    "🔁 Haftani almashtirish": admin_switch_week,
+    "📆 Hozirgi hafta turi": admin_current_week,
+    "📊 Statistika": admin_stats,
+    "📤 Barcha foydalanuvchilarga xabar": admin_broadcast_start,
+    "💾 Backup yaratish": admin_backup,
+    "👥 Admin qo'sh / o'chirish": admin_manage_admins,
+    "⬅️ Orqaga": back_to_main,
+})
+
 # ========================
 # When bot removed from group: cleanup
 # ========================
@@ -819,12 +1133,14 @@ def back_to_main(m):
 def on_left(m):
     # if bot removed, remove group from groups list
     try:
+        forget_chat_admins(m.chat.id)
         u = m.left_chat_member
-        if u and u.id == bot.get_me().id:
+        if u and u.id == BOT_ID:
             gid = m.chat.id
             if gid in groups:
-                groups.remove(gid)
-                save_json(GROUPS_FILE, groups)
+                with _store_lock:
+                    groups.discard(gid)
+                mark_dirty("groups")
     except Exception:
         pass
 
@@ -832,18 +1148,90 @@ def on_left(m):
 # Start background loops and polling
 # ========================
 def start_background():
-    th = threading.Thread(target=daily_scheduler_loop, daemon=True)
+    th = threading.Thread(target=scheduler_loop, daemon=True)
     th.start()
+    schedule_at(next_target_epoch(6), morning_job)
+    schedule_at(next_target_epoch(18), evening_job)
     # schedule reminders for current day on startup
     schedule_reminders_for_today()
 
+# ========================
+# Update routing: one queue per worker, chats hashed onto workers
+# ========================
+# Updates of one chat always land on the same worker (kept in order), while a
+# slow handler (backup upload, file write) only delays chats on its own shard.
+UPDATE_WORKERS = 8
+_update_queues = [queue.Queue() for _ in range(UPDATE_WORKERS)]
+
+def _update_chat_id(u):
+    for name in ("message", "edited_message", "channel_post", "edited_channel_post",
+                 "my_chat_member", "chat_member", "chat_join_request"):
+        obj = getattr(u, name, None)
+        if obj is not None:
+            return obj.chat.id
+    cq = getattr(u, "callback_query", None)
+    if cq is not None:
+        return cq.message.chat.id if cq.message else cq.from_user.id
+    return 0
+
+def _update_worker(q):
+    while True:
+        u = q.get()
+        try:
+            bot.process_new_updates([u])
+        except Exception as e:
+            print("Update handler error:", e)
+
+def resolve_bot_id():
+    """Return our own user id, retrying until Telegram is reachable."""
+    while True:
+        try:
+            return bot.get_me().id
+        except Exception as e:
+            print("getMe error:", e)
+            time.sleep(3)
+
+def poll_updates():
+    """Long-poll getUpdates and hand each update to its chat's worker queue."""
+    for q in _update_queues:
+        threading.Thread(target=_update_worker, args=(q,), daemon=True).start()
+    # skip updates that queued up while the bot was offline
+    offset = None
+    try:
+        pending = bot.get_updates(offset=-1, timeout=10, long_polling_timeout=0)
+        if pending:
+            offset = pending[-1].update_id + 1
+    except Exception as e:
+        print("getUpdates error:", e)
+    while True:
+        try:
+            updates = bot.get_updates(offset=offset, timeout=60, long_polling_timeout=50)
+        except Exception as e:
+            print("getUpdates error:", e)
+            time.sleep(3)
+            continue
+        for u in updates:
+            offset = u.update_id + 1
+            _update_queues[hash(_update_chat_id(u)) % UPDATE_WORKERS].put(u)
+
+def _on_sigterm(signum, frame):
+    # drop queued broadcast sends/jobs so shutdown doesn't drain them first
+    BROADCAST_POOL.shutdown(wait=False, cancel_futures=True)
+    SCHED_POOL.shutdown(wait=False, cancel_futures=True)
+    flush_dirty()
+    sys.exit(0)
+
 if __name__ == "__main__":
     print("🤖 Raspisanie bot ishga tushdi...")
+    # on SIGTERM: cancel pending sends, flush unsaved stores, exit
+    signal.signal(signal.SIGTERM, _on_sigterm)
     # register slash commands so "/" in group/private shows /bugun and /ertaga options
     register_bot_commands()
+    BOT_ID = resolve_bot_id()
     start_background()
-    # Use infinity_polling for continuous operation
+    # Long polling keeps one getUpdates request open for up to 50s instead of
+    # re-polling every few seconds
     try:
-        bot.infinity_polling()
+        poll_updates()
     except KeyboardInterrupt:
         print("Bot to'xtatildi.")